@@ -7,9 +7,13 @@ and threads. It uses LangGraph to process messages and generate responses.
 import asyncio
 import logging
 import os
+import random
 import uuid
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Optional, TypeVar
 
 import discord
+import httpx
 from aiohttp import web
 from discord.ext import commands
 from discord.message import Message
@@ -37,7 +41,17 @@ BOT = commands.Bot(command_prefix="!", intents=INTENTS)
 _LANGGRAPH_CLIENT = get_client(url=os.environ["ASSISTANT_URL"])
 _ASSISTANT_ID = os.environ.get("ASSISTANT_ID")
 _GRAPH_ID = os.environ.get("GRAPH_ID", "memory")
-_LOCK = asyncio.Lock()
+_ASSISTANT_ID_FUT: Optional[asyncio.Future[str]] = None
+_LG_THREAD_CACHE: dict[uuid.UUID, asyncio.Future[Thread]] = {}
+_LG_THREAD_CACHE_SIZE = 10_000
+_THREAD_QUEUES: dict[int, asyncio.Queue[Message]] = {}
+_THREAD_WORKERS: set[asyncio.Task] = set()
+_RESPONSE_TIMEOUT = 300  # seconds
+_MAX_RETRIES = 8
+_BACKOFF_BASE = 0.5  # seconds
+_BACKOFF_JITTER = 0.5  # seconds
+
+T = TypeVar("T")
 
 
 @BOT.event
@@ -46,12 +60,31 @@ async def on_ready():
     logger.info(f"{BOT.user} has connected to Discord!")
 
 
+async def _search_assistant_id() -> str:
+    """Look up the first assistant for the configured graph.
+
+    Returns:
+        str: The assistant ID.
+
+    Raises:
+        ValueError: If no assistant is found in the graph.
+    """
+    assistants = await _LANGGRAPH_CLIENT.assistants.search(graph_id=_GRAPH_ID)
+    if not assistants:
+        raise ValueError("No assistant found in the graph.")
+    assistant_id = assistants[0]["assistant_id"]
+    logger.warning(f"Using assistant ID: {assistant_id}")
+    return assistant_id
+
+
 async def _get_assistant_id() -> str:
     """Retrieve or set the assistant ID for the bot.
 
     This function checks if an assistant ID is already set. If not, it fetches
     the first available assistant from the LangGraph client and sets it as the
-    current assistant ID.
+    current assistant ID. The lookup runs in its own task, so no caller holds
+    it while awaiting and a cancelled caller cannot stall the others. Once
+    resolved, the ID is a plain module-level read.
 
     Returns:
         str: The assistant ID to be used for processing messages.
@@ -59,17 +92,19 @@ async def _get_assistant_id() -> str:
     Raises:
         ValueError: If no assistant is found in the graph.
     """
-    global _ASSISTANT_ID
-    if _ASSISTANT_ID is None:
-        async with _LOCK:
-            if _ASSISTANT_ID is None:
-                assistants = await _LANGGRAPH_CLIENT.assistants.search(
-                    graph_id=_GRAPH_ID
-                )
-                if not assistants:
-                    raise ValueError("No assistant found in the graph.")
-                _ASSISTANT_ID = assistants[0]["assistant_id"]
-                logger.warning(f"Using assistant ID: {_ASSISTANT_ID}")
+    global _ASSISTANT_ID, _ASSISTANT_ID_FUT
+    if _ASSISTANT_ID is not None:
+        return _ASSISTANT_ID
+    fut = _ASSISTANT_ID_FUT
+    if fut is None:
+        fut = _ASSISTANT_ID_FUT = asyncio.ensure_future(_search_assistant_id())
+    try:
+        _ASSISTANT_ID = await asyncio.shield(fut)
+    except Exception:
+        # Let the next message retry the lookup.
+        if _ASSISTANT_ID_FUT is fut:
+            _ASSISTANT_ID_FUT = None
+        raise
     return _ASSISTANT_ID
 
 
@@ -92,6 +127,19 @@ async def _get_thread(message: Message) -> discord.Thread:
         return await channel.create_thread(name="Response", message=message)
 
 
+@lru_cache(maxsize=_LG_THREAD_CACHE_SIZE)
+def _lg_thread_id_for(discord_thread_id: int) -> uuid.UUID:
+    """Map a Discord thread ID to its deterministic LangGraph thread ID.
+
+    Args:
+        discord_thread_id (int): The ID of the Discord thread.
+
+    Returns:
+        uuid.UUID: The LangGraph thread ID for the Discord thread.
+    """
+    return uuid.uuid5(uuid.NAMESPACE_DNS, f"DISCORD:{discord_thread_id}")
+
+
 async def _create_or_fetch_lg_thread(thread_id: uuid.UUID) -> Thread:
     """Create or fetch a LangGraph thread for the given thread ID.
 
@@ -111,6 +159,34 @@ async def _create_or_fetch_lg_thread(thread_id: uuid.UUID) -> Thread:
     return await _LANGGRAPH_CLIENT.threads.create(thread_id=thread_id)
 
 
+async def _get_lg_thread(thread_id: uuid.UUID) -> Thread:
+    """Get the LangGraph thread for the given thread ID, caching it in-process.
+
+    Only the first message in a thread goes to the LangGraph API. Concurrent
+    first lookups for the same thread share one request, and failed lookups are
+    evicted so the next message retries.
+
+    Args:
+        thread_id (uuid.UUID): The unique identifier for the thread.
+
+    Returns:
+        Thread: The LangGraph thread object.
+    """
+    fut = _LG_THREAD_CACHE.get(thread_id)
+    if fut is None:
+        if len(_LG_THREAD_CACHE) >= _LG_THREAD_CACHE_SIZE:
+            del _LG_THREAD_CACHE[next(iter(_LG_THREAD_CACHE))]
+        fut = _LG_THREAD_CACHE[thread_id] = asyncio.ensure_future(
+            _create_or_fetch_lg_thread(thread_id)
+        )
+    try:
+        return await asyncio.shield(fut)
+    except Exception:
+        if _LG_THREAD_CACHE.get(thread_id) is fut:
+            del _LG_THREAD_CACHE[thread_id]
+        raise
+
+
 def _format_inbound_message(message: Message) -> HumanMessage:
     """Format a Discord message into a HumanMessage for LangGraph processing.
 
@@ -132,13 +208,134 @@ def _format_inbound_message(message: Message) -> HumanMessage:
     )
 
 
+def _is_rate_limited(error: Exception) -> bool:
+    """Check whether an error is a rate-limit response from Discord or LangGraph.
+
+    Args:
+        error (Exception): The error raised by an API call.
+
+    Returns:
+        bool: True if the call was rejected with HTTP 429.
+    """
+    if isinstance(error, discord.RateLimited):
+        return True
+    if isinstance(error, discord.HTTPException):
+        return error.status == 429
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429
+    return False
+
+
+async def _with_backoff(
+    func: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any
+) -> T:
+    """Call an async API, retrying with exponential backoff when rate limited.
+
+    Args:
+        func (Callable[..., Awaitable[T]]): The API call to make.
+        *args: Positional arguments for the call.
+        **kwargs: Keyword arguments for the call.
+
+    Returns:
+        T: The result of the call.
+    """
+    for attempt in range(_MAX_RETRIES - 1):
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            if not _is_rate_limited(e):
+                raise
+            delay = _BACKOFF_BASE * 2**attempt + random.random() * _BACKOFF_JITTER
+            logger.warning(f"Rate limited; retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    return await func(*args, **kwargs)
+
+
+async def _respond(message: Message, thread: discord.Thread):
+    """Process a message through LangGraph and reply in its Discord thread.
+
+    Args:
+        message (Message): The Discord message that mentioned the bot.
+        thread (discord.Thread): The Discord thread to reply in.
+    """
+    aid = await _get_assistant_id()
+    lg_thread = await _get_lg_thread(_lg_thread_id_for(thread.id))
+    thread_id = lg_thread["thread_id"]
+    user_id = message.author.id  # TODO: is this unique?
+    run_result = await _with_backoff(
+        _LANGGRAPH_CLIENT.runs.wait,
+        thread_id,
+        assistant_id=aid,
+        input={"messages": [_format_inbound_message(message)]},
+        # A timed-out run keeps going on the server; queue behind it instead of
+        # being rejected for the busy thread.
+        multitask_strategy="enqueue",
+        config={
+            "configurable": {
+                "user_id": user_id,
+                # "model": "accounts/fireworks/models/firefunction-v2"
+            }
+        },
+    )
+    bot_message = run_result["messages"][-1]
+    response = bot_message["content"]
+    if isinstance(response, list):
+        response = "".join([r["text"] for r in response])
+    await _with_backoff(thread.send, response)
+
+
+async def _send_error_reply(thread: discord.Thread, text: str):
+    """Let the Discord thread know a mention went unanswered.
+
+    Args:
+        thread (discord.Thread): The Discord thread to reply in.
+        text (str): The error message to send.
+    """
+    try:
+        await _with_backoff(thread.send, text)
+    except Exception:
+        logger.exception(f"Failed to send error reply in thread {thread.id}")
+
+
+async def _drain_thread(thread: discord.Thread, queue: asyncio.Queue[Message]):
+    """Respond to the queued messages of one Discord thread in arrival order.
+
+    Each response is bounded by `_RESPONSE_TIMEOUT` so a stuck run cannot block
+    the rest of the conversation. The worker exits once the queue is empty; the
+    next message for the thread starts a new one.
+
+    Args:
+        thread (discord.Thread): The Discord thread to reply in.
+        queue (asyncio.Queue[Message]): The pending messages for the thread.
+    """
+    while not queue.empty():
+        message = queue.get_nowait()
+        try:
+            await asyncio.wait_for(_respond(message, thread), _RESPONSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error(
+                f"Timed out after {_RESPONSE_TIMEOUT}s responding to message"
+                f" {message.id}"
+            )
+            await _send_error_reply(
+                thread, "Sorry, that took too long to answer. Please try again."
+            )
+        except Exception:
+            logger.exception(f"Failed to respond to message {message.id}")
+            await _send_error_reply(
+                thread, "Sorry, something went wrong while answering. Please try again."
+            )
+    del _THREAD_QUEUES[thread.id]
+
+
 @BOT.event
 async def on_message(message: Message):
     """Event handler for incoming Discord messages.
 
     This function processes incoming messages, ignoring those sent by the bot itself.
-    When the bot is mentioned, it creates or fetches the appropriate threads,
-    processes the message through LangGraph, and sends the response.
+    When the bot is mentioned, the message is queued for its Discord thread so that
+    each conversation has at most one LangGraph run in flight and replies keep
+    their order.
 
     Args:
         message (Message): The incoming Discord message.
@@ -146,29 +343,14 @@ async def on_message(message: Message):
     if message.author == BOT.user:
         return
     if BOT.user.mentioned_in(message):
-        aid = await _get_assistant_id()
-        thread = await _get_thread(message)
-        lg_thread = await _create_or_fetch_lg_thread(
-            uuid.uuid5(uuid.NAMESPACE_DNS, f"DISCORD:{thread.id}")
-        )
-        thread_id = lg_thread["thread_id"]
-        user_id = message.author.id  # TODO: is this unique?
-        run_result = await _LANGGRAPH_CLIENT.runs.wait(
-            thread_id,
-            assistant_id=aid,
-            input={"messages": [_format_inbound_message(message)]},
-            config={
-                "configurable": {
-                    "user_id": user_id,
-                    # "model": "accounts/fireworks/models/firefunction-v2"
-                }
-            },
-        )
-        bot_message = run_result["messages"][-1]
-        response = bot_message["content"]
-        if isinstance(response, list):
-            response = "".join([r["text"] for r in response])
-        await thread.send(response)
+        thread = await _with_backoff(_get_thread, message)
+        queue = _THREAD_QUEUES.get(thread.id)
+        if queue is None:
+            queue = _THREAD_QUEUES[thread.id] = asyncio.Queue()
+            worker = asyncio.create_task(_drain_thread(thread, queue))
+            _THREAD_WORKERS.add(worker)
+            worker.add_done_callback(_THREAD_WORKERS.discard)
+        queue.put_nowait(message)
 
 
 async def health_check(request):
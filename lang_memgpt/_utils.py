@@ -5,7 +5,12 @@ from functools import lru_cache
 import langsmith
 from langchain_core.runnables import RunnableConfig
 from langchain_fireworks import FireworksEmbeddings
-from pinecone import Pinecone
+
+try:
+    # gRPC is faster for upsert/query traffic but needs `pinecone-client[grpc]`.
+    from pinecone.grpc import PineconeGRPC as Pinecone
+except ImportError:
+    from pinecone import Pinecone
 
 from lang_memgpt import _schemas as schemas
 from lang_memgpt import _settings as settings
@@ -13,6 +18,7 @@ from lang_memgpt import _settings as settings
 _DEFAULT_DELAY = 60  # seconds
 
 
+@lru_cache(maxsize=1)
 def get_index():
     pc = Pinecone(api_key=settings.SETTINGS.pinecone_api_key)
     return pc.Index(settings.SETTINGS.pinecone_index_name)
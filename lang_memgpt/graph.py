@@ -13,24 +13,25 @@ Configuration: Requires Pinecone and Fireworks API keys (see README for setup)
 
 from __future__ import annotations
 
-import json
+import asyncio
 import logging
+import time
 import uuid
+import weakref
 from datetime import datetime, timezone
+from functools import lru_cache
 from typing import Optional, Tuple
 
 import langsmith
-import tiktoken
+import orjson
 from langchain.chat_models import init_chat_model
 from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_core.messages.utils import get_buffer_string
+from langchain_core.messages import AnyMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables.config import (
-    RunnableConfig,
-    ensure_config,
-    get_executor_for_config,
-)
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import RunnableConfig, run_in_executor
 from langchain_core.tools import tool
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langgraph.graph import END, START, StateGraph
 from langgraph.prebuilt import ToolNode
 from typing_extensions import Literal
@@ -43,69 +44,96 @@ from lang_memgpt import _utils as utils
 logger = logging.getLogger("memory")
 
 
-_EMPTY_VEC = [0.0] * 768
+# Placeholder vector for the core memory record. Kept as a plain list: the
+# Pinecone client passes lists through as-is but calls `.tolist()` on arrays.
+_EMPTY_VEC: list[float] = [0.0] * 768
+_MAX_QUERY_CHARS = 4096
+_CORE_MEMORY_LOCKS: weakref.WeakValueDictionary[str, asyncio.Lock] = (
+    weakref.WeakValueDictionary()
+)
 
 # Initialize the search tool
 search_tool = TavilySearchResults(max_results=1)
 tools = [search_tool]
 
 
+@langsmith.traceable
+async def _save_recall_memories(memories: list[str], user_id: str) -> None:
+    """Embed and upsert a batch of recall memories.
+
+    All memories share a single embedding request and a single upsert.
+
+    Args:
+        memories (list[str]): The memories to be saved.
+        user_id (str): The user ID the memories belong to.
+    """
+    embeddings = utils.get_embeddings()
+    vectors = await embeddings.aembed_documents(memories)
+    current_time = int(time.time())
+    documents = []
+    for memory, vector in zip(memories, vectors):
+        path = constants.INSERT_PATH.format(
+            user_id=user_id,
+            event_id=str(uuid.uuid4()),
+        )
+        documents.append(
+            {
+                "id": path,
+                "values": vector,
+                "metadata": {
+                    constants.PAYLOAD_KEY: memory,
+                    constants.PATH_KEY: path,
+                    constants.TIMESTAMP_KEY: current_time,
+                    constants.TYPE_KEY: "recall",
+                    "user_id": user_id,
+                },
+            }
+        )
+    await run_in_executor(
+        None,
+        utils.get_index().upsert,
+        vectors=documents,
+        namespace=settings.SETTINGS.pinecone_namespace,
+    )
+
+
 @tool
-async def save_recall_memory(memory: str) -> str:
+async def save_recall_memory(memory: str, config: RunnableConfig) -> str:
     """Save a memory to the database for later semantic retrieval.
 
     Args:
         memory (str): The memory to be saved.
+        config (RunnableConfig): The runtime configuration for the agent.
 
     Returns:
         str: The saved memory.
     """
-    config = ensure_config()
     configurable = utils.ensure_configurable(config)
-    embeddings = utils.get_embeddings()
-    vector = await embeddings.aembed_query(memory)
-    current_time = datetime.now(tz=timezone.utc)
-    path = constants.INSERT_PATH.format(
-        user_id=configurable["user_id"],
-        event_id=str(uuid.uuid4()),
-    )
-    documents = [
-        {
-            "id": path,
-            "values": vector,
-            "metadata": {
-                constants.PAYLOAD_KEY: memory,
-                constants.PATH_KEY: path,
-                constants.TIMESTAMP_KEY: current_time,
-                constants.TYPE_KEY: "recall",
-                "user_id": configurable["user_id"],
-            },
-        }
-    ]
-    utils.get_index().upsert(
-        vectors=documents,
-        namespace=settings.SETTINGS.pinecone_namespace,
-    )
+    await _save_recall_memories([memory], configurable["user_id"])
     return memory
 
 
 @tool
-def search_memory(query: str, top_k: int = 5) -> list[str]:
+async def search_memory(
+    query: str, config: RunnableConfig, top_k: int = 5
+) -> list[str]:
     """Search for memories in the database based on semantic similarity.
 
     Args:
         query (str): The search query.
+        config (RunnableConfig): The runtime configuration for the agent.
         top_k (int): The number of results to return.
 
     Returns:
         list[str]: A list of relevant memories.
     """
-    config = ensure_config()
     configurable = utils.ensure_configurable(config)
     embeddings = utils.get_embeddings()
-    vector = embeddings.embed_query(query)
+    vector = await embeddings.aembed_query(query)
     with langsmith.trace("query", inputs={"query": query, "top_k": top_k}) as rt:
-        response = utils.get_index().query(
+        response = await run_in_executor(
+            None,
+            utils.get_index().query,
             vector=vector,
             filter={
                 "user_id": {"$eq": configurable["user_id"]},
@@ -123,7 +151,7 @@ def search_memory(query: str, top_k: int = 5) -> list[str]:
 
 
 @langsmith.traceable
-def fetch_core_memories(user_id: str) -> Tuple[str, list[str]]:
+async def fetch_core_memories(user_id: str) -> Tuple[str, list[str]]:
     """Fetch core memories for a specific user.
 
     Args:
@@ -133,59 +161,98 @@ def fetch_core_memories(user_id: str) -> Tuple[str, list[str]]:
         Tuple[str, list[str]]: The path and list of core memories.
     """
     path = constants.PATCH_PATH.format(user_id=user_id)
-    response = utils.get_index().fetch(
-        ids=[path], namespace=settings.SETTINGS.pinecone_namespace
+    response = await run_in_executor(
+        None,
+        utils.get_index().fetch,
+        ids=[path],
+        namespace=settings.SETTINGS.pinecone_namespace,
     )
     memories = []
     if vectors := response.get("vectors"):
         document = vectors[path]
         payload = document["metadata"][constants.PAYLOAD_KEY]
-        memories = json.loads(payload)["memories"]
+        memories = orjson.loads(payload)["memories"]
     return path, memories
 
 
+def _core_memory_lock(user_id: str) -> asyncio.Lock:
+    """Get the lock serializing core memory writes for a user.
+
+    Concurrent tool calls would otherwise read the same core memories and the
+    last write would drop the others' changes.
+    """
+    lock = _CORE_MEMORY_LOCKS.get(user_id)
+    if lock is None:
+        lock = _CORE_MEMORY_LOCKS[user_id] = asyncio.Lock()
+    return lock
+
+
 @tool
-def store_core_memory(memory: str, index: Optional[int] = None) -> str:
+async def store_core_memory(
+    memory: str, config: RunnableConfig, index: Optional[int] = None
+) -> str:
     """Store a core memory in the database.
 
     Args:
         memory (str): The memory to store.
+        config (RunnableConfig): The runtime configuration for the agent.
         index (Optional[int]): The index at which to store the memory.
 
     Returns:
         str: A confirmation message.
     """
-    config = ensure_config()
     configurable = utils.ensure_configurable(config)
-    path, memories = fetch_core_memories(configurable["user_id"])
-    if index is not None:
-        if index < 0 or index >= len(memories):
-            return "Error: Index out of bounds."
-        memories[index] = memory
-    else:
-        memories.insert(0, memory)
-    documents = [
-        {
-            "id": path,
-            "values": _EMPTY_VEC,
-            "metadata": {
-                constants.PAYLOAD_KEY: json.dumps({"memories": memories}),
-                constants.PATH_KEY: path,
-                constants.TIMESTAMP_KEY: datetime.now(tz=timezone.utc),
-                constants.TYPE_KEY: "recall",
-                "user_id": configurable["user_id"],
-            },
-        }
-    ]
-    utils.get_index().upsert(
-        vectors=documents,
-        namespace=settings.SETTINGS.pinecone_namespace,
-    )
+    user_id = configurable["user_id"]
+    async with _core_memory_lock(user_id):
+        path, memories = await fetch_core_memories(user_id)
+        exists = bool(memories)
+        if index is not None:
+            if index < 0 or index >= len(memories):
+                return "Error: Index out of bounds."
+            memories[index] = memory
+        else:
+            memories.insert(0, memory)
+        payload = orjson.dumps({"memories": memories}).decode()
+        current_time = int(time.time())
+        if exists:
+            # Only the metadata changes, so skip resending the vector.
+            await run_in_executor(
+                None,
+                utils.get_index().update,
+                id=path,
+                set_metadata={
+                    constants.PAYLOAD_KEY: payload,
+                    constants.TIMESTAMP_KEY: current_time,
+                },
+                namespace=settings.SETTINGS.pinecone_namespace,
+            )
+        else:
+            documents = [
+                {
+                    "id": path,
+                    "values": _EMPTY_VEC,
+                    "metadata": {
+                        constants.PAYLOAD_KEY: payload,
+                        constants.PATH_KEY: path,
+                        constants.TIMESTAMP_KEY: current_time,
+                        constants.TYPE_KEY: "recall",
+                        "user_id": user_id,
+                    },
+                }
+            ]
+            await run_in_executor(
+                None,
+                utils.get_index().upsert,
+                vectors=documents,
+                namespace=settings.SETTINGS.pinecone_namespace,
+            )
     return "Memory stored."
 
 
 # Combine all tools
 all_tools = tools + [save_recall_memory, search_memory, store_core_memory]
+# Generate the JSON schemas once; chat models accept them in place of the tools
+_TOOL_SCHEMAS = [convert_to_openai_tool(t) for t in all_tools]
 
 # Define the prompt template for the agent
 prompt = ChatPromptTemplate.from_messages(
@@ -243,6 +310,12 @@ prompt = ChatPromptTemplate.from_messages(
 )
 
 
+@lru_cache(maxsize=4)
+def _bound_for(model: str) -> Runnable:
+    """Build the prompt and tool-bound chat model for `model` once per process."""
+    return prompt | init_chat_model(model).bind_tools(_TOOL_SCHEMAS)
+
+
 async def agent(state: schemas.State, config: RunnableConfig) -> schemas.State:
     """Process the current state and generate a response using the LLM.
 
@@ -254,13 +327,10 @@ async def agent(state: schemas.State, config: RunnableConfig) -> schemas.State:
         schemas.State: The updated state with the agent's response.
     """
     configurable = utils.ensure_configurable(config)
-    llm = init_chat_model(configurable["model"])
-    bound = prompt | llm.bind_tools(all_tools)
-    core_str = (
-        "<core_memory>\n" + "\n".join(state["core_memories"]) + "\n</core_memory>"
-    )
-    recall_str = (
-        "<recall_memory>\n" + "\n".join(state["recall_memories"]) + "\n</recall_memory>"
+    bound = _bound_for(configurable["model"])
+    core_str = "\n".join(("<core_memory>", *state["core_memories"], "</core_memory>"))
+    recall_str = "\n".join(
+        ("<recall_memory>", *state["recall_memories"], "</recall_memory>")
     )
     prediction = await bound.ainvoke(
         {
@@ -275,7 +345,29 @@ async def agent(state: schemas.State, config: RunnableConfig) -> schemas.State:
     }
 
 
-def load_memories(state: schemas.State, config: RunnableConfig) -> schemas.State:
+def _recall_query(messages: list[AnyMessage]) -> str:
+    """Get the text of the latest human turn to search recall memories with.
+
+    Args:
+        messages (list[AnyMessage]): The messages in the conversation.
+
+    Returns:
+        str: The end of the latest human message, or "" if there is none.
+    """
+    for message in reversed(messages):
+        if message.type != "human":
+            continue
+        content = message.content
+        if isinstance(content, list):
+            content = "".join(
+                part if isinstance(part, str) else part.get("text", "")
+                for part in content
+            )
+        return content[-_MAX_QUERY_CHARS:]
+    return ""
+
+
+async def load_memories(state: schemas.State, config: RunnableConfig) -> schemas.State:
     """Load core and recall memories for the current conversation.
 
     Args:
@@ -287,23 +379,78 @@ def load_memories(state: schemas.State, config: RunnableConfig) -> schemas.State
     """
     configurable = utils.ensure_configurable(config)
     user_id = configurable["user_id"]
-    tokenizer = tiktoken.encoding_for_model("gpt-4o")
-    convo_str = get_buffer_string(state["messages"])
-    convo_str = tokenizer.decode(tokenizer.encode(convo_str)[:2048])
-
-    with get_executor_for_config(config) as executor:
-        futures = [
-            executor.submit(fetch_core_memories, user_id),
-            executor.submit(search_memory.invoke, convo_str),
-        ]
-        _, core_memories = futures[0].result()
-        recall_memories = futures[1].result()
+    query = _recall_query(state["messages"])
+    if query:
+        (_, core_memories), recall_memories = await asyncio.gather(
+            fetch_core_memories(user_id),
+            search_memory.ainvoke(query, config),
+        )
+    else:
+        _, core_memories = await fetch_core_memories(user_id)
+        recall_memories = []
     return {
         "core_memories": core_memories,
         "recall_memories": recall_memories,
     }
 
 
+_tool_node = ToolNode(all_tools)
+
+
+async def run_tools(state: schemas.State, config: RunnableConfig) -> schemas.State:
+    """Run the tool calls from the last message, batching recall memory saves.
+
+    Every `save_recall_memory` call in the step is embedded and upserted together,
+    so N memories cost one round-trip instead of N. The remaining tool calls run
+    concurrently through the regular ToolNode.
+
+    Args:
+        state (schemas.State): The current state of the conversation.
+        config (RunnableConfig): The runtime configuration for the agent.
+
+    Returns:
+        schemas.State: The updated state with one tool message per tool call.
+    """
+    msg = state["messages"][-1]
+    recall_calls = [
+        tc
+        for tc in msg.tool_calls
+        if tc["name"] == save_recall_memory.name
+        and isinstance(tc["args"].get("memory"), str)
+    ]
+    if not recall_calls:
+        return await _tool_node.ainvoke(state, config)
+    recall_ids = {tc["id"] for tc in recall_calls}
+    other_calls = [tc for tc in msg.tool_calls if tc["id"] not in recall_ids]
+
+    user_id = utils.ensure_configurable(config)["user_id"]
+
+    async def save_recall_batch() -> list[ToolMessage]:
+        memories = [tc["args"]["memory"] for tc in recall_calls]
+        try:
+            await _save_recall_memories(memories, user_id)
+        except Exception as e:
+            logger.exception("Failed to save recall memories.")
+            # Match ToolNode's error message for failed tool calls.
+            error = f"Error: {repr(e)}\n Please fix your mistakes."
+            memories = [error] * len(recall_calls)
+        return [
+            ToolMessage(content=memory, name=tc["name"], tool_call_id=tc["id"])
+            for memory, tc in zip(memories, recall_calls)
+        ]
+
+    async def run_others() -> list[ToolMessage]:
+        if not other_calls:
+            return []
+        remaining = msg.copy(update={"tool_calls": other_calls})
+        result = await _tool_node.ainvoke({"messages": [remaining]}, config)
+        return result["messages"]
+
+    saved, others = await asyncio.gather(save_recall_batch(), run_others())
+    by_id = {m.tool_call_id: m for m in saved + others}
+    return {"messages": [by_id[tc["id"]] for tc in msg.tool_calls]}
+
+
 def route_tools(state: schemas.State) -> Literal["tools", "__end__"]:
     """Determine whether to use tools or end the conversation based on the last message.
 
@@ -323,7 +470,7 @@ def route_tools(state: schemas.State) -> Literal["tools", "__end__"]:
 builder = StateGraph(schemas.State, schemas.GraphConfig)
 builder.add_node(load_memories)
 builder.add_node(agent)
-builder.add_node("tools", ToolNode(all_tools))
+builder.add_node("tools", run_tools)
 
 # Add edges to the graph
 builder.add_edge(START, "load_memories")
@@ -75,15 +75,21 @@ async def test_patch_memory(
             },
         )
         if num_mems_expected:
-            # Check if index.upsert was called
-            index.upsert.assert_called_once()
-            # Get named call args
-            vectors = index.upsert.call_args.kwargs["vectors"]
             rt = get_current_run_tree()
-            rt.outputs = {"upserted": [v["metadata"]["content"] for v in vectors]}
-            assert len(vectors) == 1
+            if existing:
+                # Existing core memories are updated in place
+                index.update.assert_called_once()
+                mem = index.update.call_args.kwargs["set_metadata"]["content"]
+                rt.outputs = {"upserted": [mem]}
+            else:
+                # Check if index.upsert was called
+                index.upsert.assert_called_once()
+                # Get named call args
+                vectors = index.upsert.call_args.kwargs["vectors"]
+                rt.outputs = {"upserted": [v["metadata"]["content"] for v in vectors]}
+                assert len(vectors) == 1
+                mem = vectors[0]["metadata"]["content"]
             # Check if the memory was added
-            mem = vectors[0]["metadata"]["content"]
             assert mem
 
 
@@ -0,0 +1,98 @@
+from typing import List
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from lang_memgpt._constants import PATCH_PATH
+from lang_memgpt._schemas import GraphConfig
+from lang_memgpt.graph import run_tools
+
+USER_ID = "4fddb3ef-fcc9-4ef7-91b6-89e4a3efd112"
+THREAD_ID = "e1d0b7f7-0a8b-4c5f-8c4b-8a6c9f6e5c7a"
+CONFIG = {"configurable": GraphConfig(user_id=USER_ID, thread_id=THREAD_ID)}
+
+
+def _tool_call(name: str, args: dict, idx: int) -> dict:
+    return {"name": name, "args": args, "id": f"call_{idx}"}
+
+
+def _recall_upserts(index: MagicMock) -> List[List[dict]]:
+    return [
+        c.kwargs["vectors"]
+        for c in index.upsert.call_args_list
+        if c.kwargs["vectors"][0]["id"] != PATCH_PATH.format(user_id=USER_ID)
+    ]
+
+
+@pytest.fixture
+def index():
+    with patch("lang_memgpt._utils.get_index") as get_index:
+        with patch("lang_memgpt._utils.get_embeddings") as get_embeddings:
+            index = MagicMock()
+            index.fetch.return_value = {}
+            index.query.return_value = {"matches": [{"metadata": {"content": "old"}}]}
+            get_index.return_value = index
+            embeddings = MagicMock()
+            embeddings.aembed_documents = AsyncMock(
+                side_effect=lambda docs: [[0.1] * 768 for _ in docs]
+            )
+            embeddings.aembed_query = AsyncMock(return_value=[0.1] * 768)
+            get_embeddings.return_value = embeddings
+            yield index
+
+
+async def test_recall_memories_share_one_upsert(index: MagicMock):
+    memories = ["I like tea.", "I have a dog.", "I live in Paris."]
+    tool_calls = [
+        _tool_call("save_recall_memory", {"memory": m}, i)
+        for i, m in enumerate(memories)
+    ]
+    result = await run_tools(
+        {"messages": [AIMessage(content="", tool_calls=tool_calls)]}, CONFIG
+    )
+
+    assert index.upsert.call_count == 1
+    (vectors,) = _recall_upserts(index)
+    assert [v["metadata"]["content"] for v in vectors] == memories
+    assert all(v["metadata"]["user_id"] == USER_ID for v in vectors)
+    assert [m.content for m in result["messages"]] == memories
+
+
+async def test_tool_messages_follow_tool_call_order(index: MagicMock):
+    tool_calls = [
+        _tool_call("search_memory", {"query": "pets"}, 0),
+        _tool_call("save_recall_memory", {"memory": "I have a dog."}, 1),
+        _tool_call("store_core_memory", {"memory": "Name is Sam."}, 2),
+        _tool_call("save_recall_memory", {"memory": "I like tea."}, 3),
+    ]
+    result = await run_tools(
+        {"messages": [AIMessage(content="", tool_calls=tool_calls)]}, CONFIG
+    )
+
+    messages = result["messages"]
+    assert [m.tool_call_id for m in messages] == [tc["id"] for tc in tool_calls]
+    assert [m.name for m in messages] == [tc["name"] for tc in tool_calls]
+    assert messages[1].content == "I have a dog."
+    assert messages[3].content == "I like tea."
+    (vectors,) = _recall_upserts(index)
+    assert [v["metadata"]["content"] for v in vectors] == [
+        "I have a dog.",
+        "I like tea.",
+    ]
+    assert messages[0].content == '["old"]'
+
+
+async def test_failed_upsert_reports_error_per_recall_call(index: MagicMock):
+    index.upsert.side_effect = RuntimeError("boom")
+    tool_calls = [
+        _tool_call("save_recall_memory", {"memory": "I like tea."}, 0),
+        _tool_call("save_recall_memory", {"memory": "I have a dog."}, 1),
+    ]
+    result = await run_tools(
+        {"messages": [AIMessage(content="", tool_calls=tool_calls)]}, CONFIG
+    )
+
+    expected = "Error: RuntimeError('boom')\n Please fix your mistakes."
+    assert [m.content for m in result["messages"]] == [expected, expected]
+    assert [m.tool_call_id for m in result["messages"]] == ["call_0", "call_1"]